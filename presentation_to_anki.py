@@ -1,19 +1,164 @@
+import copy
+import hashlib
 import json
+import logging
+import multiprocessing
 import os
-import random
+import queue
 import re
 import sys
 import threading
 import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from itertools import chain
 import tkinter as tk
 from tkinter import filedialog, ttk, messagebox
 
-import PyPDF2
 # removed (outdated) fitz import because of https://github.com/pymupdf/PyMuPDF/issues/1537
 import genanki
 import pymupdf  # PyMuPDF for better PDF extraction
 from deepseek import DeepSeekAPI
 from dotenv import load_dotenv
+from json_repair import repair_json
+
+logger = logging.getLogger(__name__)
+
+# DeepSeek model used to generate the flashcards
+DEEPSEEK_MODEL = 'deepseek-chat'
+# Number of concurrent DeepSeek requests
+MAX_API_WORKERS = 8
+# Number of slides sent to DeepSeek in a single request
+SLIDES_PER_REQUEST = 8
+# PDFs with at least this many pages are extracted in parallel processes (starting the spawned workers
+# takes ~0.4 s while a typical page takes ~1 ms, so smaller PDFs are faster to extract serially)
+PARALLEL_EXTRACTION_MIN_PAGES = 1000
+# Number of pages extracted by a worker process at once
+PAGES_PER_WORKER = 32
+# Consecutive slides containing more than this share of the word shingles of the first slide of their group
+# (e.g. build-up slides) are merged into one request, up to SLIDES_PER_REQUEST slides per group
+NEAR_DUPLICATE_SIMILARITY = 0.85
+# Number of words per shingle used to compare consecutive slides
+SHINGLE_SIZE = 5
+# Output tokens allowed per slide in a request (5 cards with comprehensive answers plus headroom)
+MAX_TOKENS_PER_SLIDE = 1000
+
+# Common patterns to ignore in titles (like "June 1, 1999 Vi Editor X")
+HEADER_PATTERNS = [
+    re.compile(r"\w+ \d+, \d{4} .+ \d+$"),  # Date format followed by title and number
+    re.compile(r"^\d+$"),  # Just a number
+    re.compile(r"Slide \d+$"),  # "Slide X"
+]
+
+# Content lines inside the top or bottom margin (this share of the page height) are treated as headers
+# or footers if they match HEADER_PATTERNS or have a font smaller than this share of the body text
+HEADER_FONT_RATIO = 0.8
+HEADER_MARGIN = 0.1
+
+# Generated cards are cached across runs, keyed by model and slide text
+CARD_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "p2a", "cards.json")
+
+
+def _stable_anki_id(name):
+    """Derive an Anki model or deck ID in [2**30, 2**31) from a name, stable across runs"""
+    # hash() is salted per process, so use a real digest
+    digest = hashlib.blake2b(name.encode('utf-8'), digest_size=4).digest()
+    return int.from_bytes(digest, 'big') & 0x3FFFFFFF | (1 << 30)
+
+
+def _is_valid_card_list(cards):
+    """Return whether cards is a list of cards with question and answer strings"""
+    return isinstance(cards, list) and all(
+        isinstance(card, dict) and isinstance(card.get('question'), str) and isinstance(card.get('answer'), str)
+        for card in cards
+    )
+
+
+def _is_unterminated_json(text):
+    """Return whether a JSON text was cut off, i.e. a string or bracket is still open at its end"""
+    depth = 0
+    in_string = False
+    escaped = False
+    for char in text:
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == '\\':
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in '{[':
+            depth += 1
+        elif char in '}]':
+            depth -= 1
+    return in_string or depth > 0
+
+
+def _shingles(text):
+    """Return the set of word shingles of a text"""
+    words = text.split()
+    if len(words) <= SHINGLE_SIZE:
+        return {' '.join(words)}
+    return {' '.join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+
+def _containment(first, second):
+    """Return the share of the first set contained in the second one"""
+    return len(first & second) / max(1, len(first))
+
+
+def _split_title_and_content(page):
+    """Split a PDF page into title and content using its text blocks and font sizes"""
+    blocks = []
+    for block in page.get_text("dict")['blocks']:
+        # Skip image blocks
+        if block['type'] != 0:
+            continue
+        
+        # Keep the position and largest font size of each line to recognize headers and footers later on
+        lines = []
+        for line in block['lines']:
+            text = ''.join(span['text'] for span in line['spans']).strip()
+            if text:
+                lines.append((line['bbox'][1], max(span['size'] for span in line['spans']), text))
+        if not lines:
+            continue
+        
+        font_size = max(line[1] for line in lines)
+        blocks.append((block['bbox'][1], block['bbox'][0], font_size, lines))
+    
+    if not blocks:
+        return "", ""
+    
+    # Sort the blocks in reading order (top to bottom, left to right)
+    blocks.sort(key=lambda b: (b[0], b[1]))
+    
+    # The block with the largest font is the title, the topmost one wins ties
+    title_block = max(blocks, key=lambda b: b[2])
+    title = ' '.join(line[2] for line in title_block[3])
+    content_lines = [line for b in blocks if b is not title_block for line in b[3]]
+    
+    # Drop headers and footers (dates, page numbers) so they are not sent with every slide
+    if content_lines:
+        body_font_size = max(content_lines, key=lambda line: len(line[2]))[1]
+        page_height = page.rect.height
+        content_lines = [
+            line for line in content_lines
+            if not ((line[0] < page_height * HEADER_MARGIN or line[0] > page_height * (1 - HEADER_MARGIN))
+                    and (line[1] < body_font_size * HEADER_FONT_RATIO
+                         or any(pattern.match(line[2]) for pattern in HEADER_PATTERNS)))
+        ]
+    content = '\n'.join(line[2] for line in content_lines)
+    
+    return title, content
+
+
+def _extract_page_range(page_range):
+    """Extract the (title, content) pairs of a range of PDF pages with a separate document handle"""
+    pdf_path, start, stop = page_range
+    with pymupdf.open(pdf_path) as doc:
+        return [_split_title_and_content(doc[i]) for i in range(start, stop)]
 
 
 class DeepSeekEnhancedConverter:
@@ -21,8 +166,12 @@ class DeepSeekEnhancedConverter:
         # Initialize AI client
         self.client = DeepSeekAPI(api_key=api_key)
         
-        # Create a unique model ID for Anki
-        self.model_id = random.randrange(1 << 30, 1 << 31)
+        # Load the cards generated in previous runs
+        self.card_cache = self._load_card_cache()
+        self.card_cache_lock = threading.Lock()
+        
+        # Create a model ID for Anki that stays the same across runs
+        self.model_id = _stable_anki_id('ai-presentation-card-v1')
         # Define the card template
         self.model = genanki.Model(
             self.model_id,
@@ -41,85 +190,45 @@ class DeepSeekEnhancedConverter:
                 },
             ])
     
-    def extract_from_pdf(self, pdf_path, progress_callback=None):
-        """Extract text from PDF presentation using PyMuPDF for better extraction"""
-        slides_content = []
+    def count_pdf_pages(self, pdf_path):
+        """Return the number of pages (slides) in a PDF presentation"""
+        with pymupdf.open(pdf_path) as doc:
+            return len(doc)
+
+    def iter_slides_from_pdf(self, pdf_path, progress_callback=None):
+        """Yield the text of each PDF slide in turn using PyMuPDF"""
+        total_pages = self.count_pdf_pages(pdf_path)
         
-        # Try PyMuPDF first (better extraction)
-        try:
-            doc = pymupdf.open(pdf_path)
-            total_pages = len(doc)
+        for i, (title, content) in enumerate(self._iter_page_texts(pdf_path, total_pages), 1):
+            if progress_callback:
+                progress_callback(10 + (i / total_pages * 20), f"Extracting slide {i}/{total_pages}...")
             
-            for i, page in enumerate(doc, 1):
-                if progress_callback:
-                    progress_callback(10 + (i / total_pages * 20), f"Extracting slide {i}/{total_pages}...")
-                
-                # Extract text blocks from the page
-                text = page.get_text()
-                
-                # Attempt to identify title and content
-                lines = text.split('\n')
-                title = ""
-                content = ""
-                
-                # Skip empty lines at the beginning
-                clean_lines = [line for line in lines if line.strip()]
-                
-                if clean_lines:
-                    # Consider the first non-empty line as title
-                    title = clean_lines[0].strip()
-                    # Join the rest as content
-                    content = '\n'.join(clean_lines[1:]).strip()
-                
-                # Store slide info even if title or content is minimally populated
-                slides_content.append({
-                    'title': title,
-                    'content': content,
-                    'slide_num': i
-                })
-                
-                # Debug info
-                print(f"Extracted PDF Slide {i}:")
-                print(f"  Title: {title}")
-                print(f"  Content length: {len(content)}")
+            # Debug info
+            logger.debug("Extracted PDF Slide %d:\n  Title: %s\n  Content length: %d", i, title, len(content))
             
-            doc.close()
-        except ImportError:
-            # Fallback to PyPDF2 if PyMuPDF is not available
-            print("PyMuPDF not available, falling back to PyPDF2 (less accurate extraction)")
-            with open(pdf_path, 'rb') as file:
-                reader = PyPDF2.PdfReader(file)
-                total_pages = len(reader.pages)
-                
-                for i in range(total_pages):
-                    if progress_callback:
-                        progress_callback(10 + (i / total_pages * 20), f"Extracting slide {i+1}/{total_pages}...")
-                    
-                    page = reader.pages[i]
-                    text = page.extract_text()
-                    
-                    # Simple slide content extraction
-                    lines = text.split('\n')
-                    title = ""
-                    content = ""
-                    
-                    if lines:
-                        title = lines[0].strip()
-                        content = '\n'.join(lines[1:]).strip()
-                    
-                    # Store slide info
-                    slides_content.append({
-                        'title': title,
-                        'content': content,
-                        'slide_num': i+1
-                    })
-                    
-                    # Debug info
-                    print(f"Extracted PDF Slide {i+1}:")
-                    print(f"  Title: {title}")
-                    print(f"  Content length: {len(content)}")
-        
-        return slides_content
+            # Yield slide info even if title or content is minimally populated
+            yield {
+                'title': title,
+                'content': content,
+                'slide_num': i
+            }
+    
+    def _iter_page_texts(self, pdf_path, total_pages):
+        """Yield the title and content of each page, extracting large PDFs in parallel"""
+        if total_pages < PARALLEL_EXTRACTION_MIN_PAGES:
+            with pymupdf.open(pdf_path) as doc:
+                for page in doc:
+                    # Use the layout analysis of PyMuPDF to identify title and content
+                    yield _split_title_and_content(page)
+            return
+        
+        # PyMuPDF is not thread safe, so each worker process opens its own document and extracts a range of pages
+        page_ranges = [(pdf_path, start, min(start + PAGES_PER_WORKER, total_pages))
+                       for start in range(0, total_pages, PAGES_PER_WORKER)]
+        # Fork is not safe from the conversion thread of the GUI, so start fresh worker processes
+        with ProcessPoolExecutor(mp_context=multiprocessing.get_context('spawn')) as executor:
+            for page_texts in executor.map(_extract_page_range, page_ranges):
+                yield from page_texts
     
     def clean_slide_content(self, slide):
         """Clean and prepare slide content for DeepSeek API"""
@@ -127,21 +236,14 @@ class DeepSeekEnhancedConverter:
         title = slide['title']
         content = slide['content']
         
-        # Common patterns to ignore in titles (like "June 1, 1999 Vi Editor X")
-        header_patterns = [
-            r"\w+ \d+, \d{4} .+ \d+",  # Date format followed by title and number
-            r"^\d+$",  # Just a number
-            r"Slide \d+",  # "Slide X"
-        ]
-        
-        for pattern in header_patterns:
-            if re.match(pattern, title):
+        for pattern in HEADER_PATTERNS:
+            if pattern.match(title):
                 # Try to extract a better title from content if possible
-                content_lines = content.split('\n')
-                if content_lines and content_lines[0].strip():
+                first_line, _, remaining_content = content.partition('\n')
+                if first_line.strip():
                     # Move first line of content to title
-                    title = content_lines[0].strip()
-                    content = '\n'.join(content_lines[1:]).strip()
+                    title = first_line.strip()
+                    content = remaining_content.strip()
                 break
         
         # Return the cleaned slide content
@@ -151,152 +253,380 @@ class DeepSeekEnhancedConverter:
             'slide_num': slide['slide_num']
         }
 
-    def generate_flashcards_with_deepseek(self, slides_content, progress_callback=None):
-        """Use DeepSeek to generate flashcards from slide content"""
-        all_cards = []
-        total_slides = len(slides_content)
+    def generate_flashcards_with_deepseek(self, slides_content, *, total_slides=None, progress_callback=None,
+                                          cards_callback=None):
+        """Use DeepSeek to generate flashcards from slide content, passing each slide's cards to cards_callback"""
+        if total_slides is None:
+            if not hasattr(slides_content, '__len__'):
+                raise TypeError("total_slides is required when slides_content is an iterator")
+            total_slides = len(slides_content)
         processed_slides = 0
-        
-        for slide in slides_content:
-            processed_slides += 1
+
+        # The API calls are network bound, so send the slides in batches and run the batches concurrently.
+        # Batches are submitted as soon as they fill up, so generation overlaps with extraction.
+        futures = []
+        # Cards of each slide by slide position, every slide is written exactly once
+        slide_cards = [None] * total_slides
+        # Slide texts seen in this run and the slides repeating them (like agenda or section slides)
+        seen_slides = {}
+        duplicate_of = {}
+        next_slide = 0
+        # The worker threads only queue the numbers of the slides whose cards arrived. The progress is reported
+        # from this thread, so the UI is never called from the workers.
+        progress_queue = queue.Queue()
+        # Slide groups sent to DeepSeek by their slide number, until their progress is reported
+        queued_groups = {}
+
+        def report_progress(message):
             if progress_callback:
-                progress_callback(30 + (processed_slides / total_slides * 50), 
-                                  f"Generating flashcards for slide {slide['slide_num']}/{total_slides}...")
-            
-            # Clean and prepare slide content
-            cleaned_slide = self.clean_slide_content(slide)
-            
-            # If slide has minimal content, try to create a basic card
-            has_meaningful_content = len(cleaned_slide['title']) > 3 or len(cleaned_slide['content']) > 10
-            
-            if not has_meaningful_content:
-                print(f"Skipping slide {cleaned_slide['slide_num']} - insufficient content")
-                continue
-                
-            # Combine title and content for context
-            full_text = f"Title: {cleaned_slide['title']}\n\nContent: {cleaned_slide['content']}"
+                progress_callback(30 + (processed_slides / total_slides * 50), message)
 
-            # Generate flashcards using DeepSeek with retries
-            max_retries = 3
-            retry_count = 0
-            success = False
-            
-            while retry_count < max_retries and not success:
+        def drain_progress_queue():
+            nonlocal processed_slides
+            while True:
                 try:
-                    cards = self._ask_ai_for_cards(full_text)
-                    
-                    # Add slide reference to each card
+                    slide_num = progress_queue.get_nowait()
+                except queue.Empty:
+                    return
+
+                # Report each slide group once, even if its cards arrive again in a retried request
+                slide_group = queued_groups.pop(slide_num, None)
+                if slide_group:
+                    processed_slides += len(slide_group['slide_nums'])
+                    report_progress(f"Generated flashcards for slide {slide_num}/{total_slides}...")
+
+        def flush_completed_slides():
+            # Hand over the slides that are complete, stopping at the first one still pending
+            nonlocal next_slide
+            while next_slide < total_slides:
+                if next_slide in duplicate_of:
+                    # Duplicate slides get a copy of the cards of the first identical slide
+                    cards = copy.deepcopy(slide_cards[duplicate_of[next_slide]])
                     for card in cards:
-                        card['slide'] = f"Slide {cleaned_slide['slide_num']}"
-                        card['context'] = cleaned_slide['title']
-                    
-                    all_cards.extend(cards)
-                    print(f"Generated {len(cards)} cards for slide {cleaned_slide['slide_num']}")
-                    success = True
-                    
-                except Exception as e:
-                    retry_count += 1
-                    print(f"Error generating cards for slide {cleaned_slide['slide_num']} (attempt {retry_count}): {e}")
-                    time.sleep(1)  # Brief pause before retry
-
-            # Create a basic card if all DeepSeek attempts failed
-            if not success:
-                print(f"Falling back to basic card for slide {cleaned_slide['slide_num']}")
-                if cleaned_slide['title']:
-                    question = f"Explain the concept of: {cleaned_slide['title']}"
-                    answer = cleaned_slide['content'] if cleaned_slide['content'] else "Review the slide content."
-                    
-                    all_cards.append({
-                        'question': question,
-                        'answer': answer,
-                        'slide': f"Slide {cleaned_slide['slide_num']}",
-                        'context': "Auto-generated (DeepSeek API failed)"
-                    })
-        
-        return all_cards
-
-    def _ask_ai_for_cards(self, slide_text):
-        """Ask Ai to generate question-answer pairs from the slide text"""
+                        card['slide'] = f"Slide {next_slide + 1}"
+                    slide_cards[next_slide] = cards
+                elif slide_cards[next_slide] is None:
+                    break
+
+                if cards_callback:
+                    cards_callback(slide_cards[next_slide])
+                next_slide += 1
+
+        with ThreadPoolExecutor(max_workers=MAX_API_WORKERS) as executor:
+            batch = []
+            # Consecutive near-identical slides (like build-up slides adding one bullet at a time) are merged
+            # into a single slide group before they are sent to DeepSeek
+            slide_group = None
+            group_shingles = None
+
+            def submit_slide_group(group):
+                # Use the cached cards of the group or queue it for the next batch
+                nonlocal batch, processed_slides
+                cached_cards = self.card_cache.get(self._slide_cache_key(group))
+                if cached_cards is not None:
+                    logger.debug("Reusing %d cached cards for slide %d", len(cached_cards), group['slide_num'])
+                    processed_slides += len(group['slide_nums'])
+                    slide_cards[group['slide_num'] - 1] = self._add_slide_reference(copy.deepcopy(cached_cards), group)
+                    return
+
+                batch.append(group)
+                queued_groups[group['slide_num']] = group
+                if len(batch) == SLIDES_PER_REQUEST:
+                    futures.append(executor.submit(self._process_batch, batch, progress_queue.put))
+                    batch = []
+
+            for slide in slides_content:
+                # Clean and prepare slide content
+                cleaned_slide = self.clean_slide_content(slide)
+                slide_index = cleaned_slide['slide_num'] - 1
+
+                # If slide has minimal content, try to create a basic card
+                has_meaningful_content = len(cleaned_slide['title']) > 3 or len(cleaned_slide['content']) > 10
+
+                if not has_meaningful_content:
+                    logger.debug("Skipping slide %d - insufficient content", cleaned_slide['slide_num'])
+                    slide_cards[slide_index] = []
+                    processed_slides += 1
+                    continue
+
+                # Reuse the cards of identical slides instead of asking DeepSeek again
+                slide_key = self._slide_cache_key(cleaned_slide)
+                if slide_key in seen_slides:
+                    duplicate_of[slide_index] = seen_slides[slide_key]
+                    processed_slides += 1
+                    continue
+
+                shingles = _shingles(f"{cleaned_slide['title']}\n{cleaned_slide['content']}")
+                if (slide_group and len(slide_group['slide_nums']) < SLIDES_PER_REQUEST
+                        and _containment(group_shingles, shingles) > NEAR_DUPLICATE_SIMILARITY):
+                    logger.debug("Merging slide %d into slide %d", cleaned_slide['slide_num'], slide_group['slide_num'])
+                    self._merge_into_slide_group(slide_group, cleaned_slide)
+                    # The cards of the whole group are stored on its first slide
+                    slide_cards[slide_index] = []
+                else:
+                    if slide_group:
+                        submit_slide_group(slide_group)
+                    slide_group = dict(cleaned_slide, slide_nums=[cleaned_slide['slide_num']])
+                    group_shingles = shingles
+
+                seen_slides[slide_key] = slide_group['slide_num'] - 1
+
+            if slide_group:
+                submit_slide_group(slide_group)
+            if batch:
+                futures.append(executor.submit(self._process_batch, batch, progress_queue.put))
+
+            report_progress("Generating flashcards with DeepSeek...")
+            flush_completed_slides()
+
+            # Wake up regularly to report the progress of the slides streaming in
+            pending_futures = set(futures)
+            while pending_futures:
+                done_futures, pending_futures = wait(pending_futures, timeout=0.1, return_when=FIRST_COMPLETED)
+                drain_progress_queue()
+
+                for future in done_futures:
+                    for slide_num, cards in future.result():
+                        slide_cards[slide_num - 1] = cards
+                flush_completed_slides()
+
+        self._save_card_cache()
+
+        # Flatten in slide order regardless of completion order
+        return list(chain.from_iterable(cards for cards in slide_cards if cards))
+
+    def _process_batch(self, batch, slide_done_callback=None):
+        """Generate the flashcards for a batch of cleaned slides, returned as (slide_num, cards) pairs"""
+        # Generate flashcards using DeepSeek with retries, asking again only for the slides still missing
+        max_retries = 3
+        retry_count = 0
+        pending_slides = batch
+        slide_cards = []
+
+        while pending_slides and retry_count < max_retries:
+            slide_nums = ', '.join(str(cleaned_slide['slide_num']) for cleaned_slide in pending_slides)
+            try:
+                # slide_done_callback only queues the slide number, so it cannot fail the request
+                cards_by_slide, cacheable = self._ask_ai_for_cards_batch(pending_slides, slide_done_callback)
+            except Exception as e:
+                retry_count += 1
+                logger.warning("Error generating cards for slides %s (attempt %d): %s", slide_nums, retry_count, e)
+                time.sleep(1)  # Brief pause before retry
+                continue
+
+            missing_slides = []
+            for cleaned_slide in pending_slides:
+                if cleaned_slide['slide_num'] not in cards_by_slide:
+                    missing_slides.append(cleaned_slide)
+                    continue
+
+                cards = self._add_slide_reference(cards_by_slide[cleaned_slide['slide_num']], cleaned_slide)
+
+                # Remember the generated cards for identical slides in later runs
+                if cacheable:
+                    with self.card_cache_lock:
+                        self.card_cache[self._slide_cache_key(cleaned_slide)] = [
+                            {'question': card['question'], 'answer': card['answer']} for card in cards
+                        ]
+
+                logger.debug("Generated %d cards for slide %d", len(cards), cleaned_slide['slide_num'])
+                slide_cards.append((cleaned_slide['slide_num'], cards))
+                if slide_done_callback:
+                    slide_done_callback(cleaned_slide['slide_num'])
+
+            pending_slides = missing_slides
+            if missing_slides:
+                retry_count += 1
+                logger.warning("DeepSeek returned no cards for slides %s (attempt %d)",
+                               ', '.join(str(cleaned_slide['slide_num']) for cleaned_slide in missing_slides),
+                               retry_count)
+
+        # Create basic cards for the slides all DeepSeek attempts failed for
+        if pending_slides:
+            logger.warning("Falling back to basic cards for slides %s",
+                           ', '.join(str(cleaned_slide['slide_num']) for cleaned_slide in pending_slides))
+            for cleaned_slide in pending_slides:
+                slide_cards.append((cleaned_slide['slide_num'], self._basic_cards(cleaned_slide)))
+                if slide_done_callback:
+                    slide_done_callback(cleaned_slide['slide_num'])
+
+        return slide_cards
+
+    def _merge_into_slide_group(self, slide_group, cleaned_slide):
+        """Merge a near-identical slide into a slide group, keeping each content line once"""
+        content_lines = slide_group['content'].split('\n')
+        known_lines = set(content_lines)
+        content_lines.extend(line for line in cleaned_slide['content'].split('\n') if line not in known_lines)
+        slide_group['content'] = '\n'.join(content_lines).strip()
+        slide_group['slide_nums'].append(cleaned_slide['slide_num'])
+
+    def _slide_reference(self, cleaned_slide):
+        """Return the slide reference shown on the cards of a slide or slide group"""
+        slide_nums = cleaned_slide.get('slide_nums', [cleaned_slide['slide_num']])
+        if len(slide_nums) > 1:
+            return f"Slides {', '.join(str(slide_num) for slide_num in slide_nums)}"
+        return f"Slide {slide_nums[0]}"
+
+    def _add_slide_reference(self, cards, cleaned_slide):
+        """Add the slide reference to each card"""
+        for card in cards:
+            card['slide'] = self._slide_reference(cleaned_slide)
+            card['context'] = cleaned_slide['title']
+        return cards
+
+    def _slide_cache_key(self, cleaned_slide):
+        """Return the card cache key of a slide, derived from the model and the slide text"""
+        full_text = f"Title: {cleaned_slide['title']}\n\nContent: {cleaned_slide['content']}"
+        digest = hashlib.blake2b(full_text.encode('utf-8'), digest_size=16).hexdigest()
+        return f"{DEEPSEEK_MODEL}:{digest}"
+
+    def _load_card_cache(self):
+        """Load the cards generated in previous runs"""
+        try:
+            with open(CARD_CACHE_PATH, 'r', encoding='utf-8') as file:
+                card_cache = json.load(file)
+        except FileNotFoundError:
+            return {}
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning("Ignoring unreadable card cache %s: %s", CARD_CACHE_PATH, e)
+            return {}
+
+        if not isinstance(card_cache, dict):
+            logger.warning("Ignoring malformed card cache %s", CARD_CACHE_PATH)
+            return {}
+
+        # Drop entries that are not lists of cards
+        return {key: cards for key, cards in card_cache.items() if _is_valid_card_list(cards)}
+
+    def _save_card_cache(self):
+        """Persist the card cache so reruns on the same deck skip the API"""
+        try:
+            os.makedirs(os.path.dirname(CARD_CACHE_PATH), exist_ok=True)
+            temp_path = f"{CARD_CACHE_PATH}.tmp"
+            with open(temp_path, 'w', encoding='utf-8') as file:
+                json.dump(self.card_cache, file, ensure_ascii=False)
+            os.replace(temp_path, CARD_CACHE_PATH)
+        except OSError as e:
+            logger.warning("Could not save card cache %s: %s", CARD_CACHE_PATH, e)
+
+    def _basic_cards(self, cleaned_slide):
+        """Create a basic card from the slide title when DeepSeek could not generate any"""
+        if not cleaned_slide['title']:
+            return []
+
+        question = f"Explain the concept of: {cleaned_slide['title']}"
+        answer = cleaned_slide['content'] if cleaned_slide['content'] else "Review the slide content."
+
+        return [{
+            'question': question,
+            'answer': answer,
+            'slide': self._slide_reference(cleaned_slide),
+            'context': "Auto-generated (DeepSeek API failed)"
+        }]
+
+    def _ask_ai_for_cards_batch(self, slides, slide_callback=None):
+        """Ask Ai to generate question-answer pairs for a batch of slides, keyed by slide number and
+        returned together with whether they may be cached (the response did not need to be repaired)"""
         prompt = """
-        Please analyze this slide content from an educational presentation and create 1-5 Anki flashcards based on the key concepts.
+        Please analyze these slides from an educational presentation and create 1-5 Anki flashcards for each slide based on the key concepts.
         
         For each important concept, create a question that tests understanding and a comprehensive answer.
         
-        Slide content:
-        {slide_text}
+        Slides (as JSON):
+        {slides_json}
         
-        Format your response as a JSON array of objects with 'question' and 'answer' keys.
+        Format your response as a JSON object with a "slides" array. Each entry holds the "slide_num" it belongs to
+        and a "cards" array of objects with 'question' and 'answer' keys.
         Example:
-        [
-            {{"question": "What is the capital of France?", "answer": "Paris"}},
-            {{"question": "What is the formula for calculating area of a circle?", "answer": "A = πr²"}}
-        ]
+        {{"slides": [
+            {{"slide_num": 1, "cards": [{{"question": "What is the capital of France?", "answer": "Paris"}}]}},
+            {{"slide_num": 2, "cards": [{{"question": "What is the formula for calculating area of a circle?", "answer": "A = πr²"}}]}}
+        ]}}
         
         Only output valid JSON that can be parsed with json.loads() in Python.
         
-        If there's not enough meaningful content to create flashcards, return an empty array: []
+        If there's not enough meaningful content on a slide to create flashcards, return an empty "cards" array for it.
         """
 
+        slides_json = json.dumps([
+            {'slide_num': slide['slide_num'], 'title': slide['title'], 'content': slide['content']}
+            for slide in slides
+        ], ensure_ascii=False)
+
         conversion_prompt = [
             {"role": "system",
              "content": "You create high-quality flashcards from educational content. Always respond with valid JSON."},
-            {"role": "user", "content": prompt.format(slide_text=slide_text)}
+            {"role": "user", "content": prompt.format(slides_json=slides_json)}
         ]
-        kwargs = {'max_tokens': 8192, 'temperature': 0.7, }
+        # JSON mode constrains the output to a JSON object, and the token cap bounds the output latency
+        kwargs = {
+            'max_tokens': min(MAX_TOKENS_PER_SLIDE * len(slides), 8192),
+            'temperature': 0.3,
+            'response_format': {'type': 'json_object'},
+        }
 
-        # Using AI API
-        response = self.client.chat_completion(conversion_prompt, **kwargs)
+        # Using AI API, streaming the response
+        chunks = []
+        completed_slides = 0
+        for chunk in self.client.chat_completion(conversion_prompt, stream=True, model=DEEPSEEK_MODEL, **kwargs):
+            chunks.append(chunk)
+            
+            # Opportunistically parse the partial response whenever a cards array may have been closed,
+            # so slide_callback can report each slide as soon as its cards arrived
+            if slide_callback and ']' in chunk:
+                partial_data = repair_json(''.join(chunks), return_objects=True)
+                entries = partial_data.get('slides', []) if isinstance(partial_data, dict) else []
+                # All entries but the last one are complete while the response is still streaming
+                for entry in entries[completed_slides:len(entries) - 1]:
+                    if isinstance(entry, dict) and isinstance(entry.get('slide_num'), int):
+                        slide_callback(entry['slide_num'])
+                completed_slides = max(completed_slides, len(entries) - 1)
         
         # Extract the response text
-        cards_text = response
+        cards_text = ''.join(chunks)
         
         # Process the response to extract cards
+        repaired = False
         try:
             # Try to parse the response as JSON
-            cards = json.loads(cards_text)
-            return cards
+            response_data = json.loads(cards_text)
         except json.JSONDecodeError:
-            # Fallback: Extract JSON pattern from the response
+            # Fallback: Repair common JSON formatting issues (unquoted keys, trailing commas, missing brackets)
+            response_data = json.loads(repair_json(cards_text))
+            repaired = True
+
+        if not isinstance(response_data, dict):
+            raise ValueError("DeepSeek response is not a JSON object")
+
+        entries = response_data.get('slides', [])
+        if repaired and _is_unterminated_json(cards_text):
+            # The response was cut off at max_tokens, so its last slide may be incomplete
+            entries = entries[:-1]
+
+        # Dispatch the cards back to their slides, malformed entries count as missing
+        cards_by_slide = {}
+        for entry in entries:
+            if not isinstance(entry, dict) or not _is_valid_card_list(entry.get('cards', [])):
+                continue
             try:
-                # Look for a JSON array pattern
-                json_pattern = re.search(r'\[\s*\{.*\}\s*\]', cards_text, re.DOTALL)
-                if json_pattern:
-                    json_str = json_pattern.group(0)
-                    # Fix common JSON formatting issues
-                    json_str = re.sub(r'(\w+):', r'"\1":', json_str)  # Add quotes to keys
-                    json_str = re.sub(r':\s*"([^"]*)"', r': "\1"', json_str)  # Fix value quotes
-                    cards = json.loads(json_str)
-                    return cards
-            except (json.JSONDecodeError, AttributeError):
-                pass
-            
-            # Last resort: manual extraction
-            cards = []
-            
-            # Look for question/answer patterns
-            qa_pairs = re.findall(r'["\']{0,1}question["\']{0,1}\s*:\s*["\'](.*?)["\']\s*,\s*["\']{0,1}answer["\']{0,1}\s*:\s*["\'](.*?)["\']', 
-                                  cards_text, re.DOTALL)
-            
-            for q, a in qa_pairs:
-                cards.append({"question": q.strip(), "answer": a.strip()})
-            
-            if not cards:
-                # Try a more lenient pattern
-                q_blocks = re.findall(r'question["\']?:[\s"\']*(.+?)[\s"\']*,', cards_text)
-                a_blocks = re.findall(r'answer["\']?:[\s"\']*(.+?)[\s"\']*[},]', cards_text)
-                
-                for i in range(min(len(q_blocks), len(a_blocks))):
-                    q = re.sub(r'["\']', '', q_blocks[i]).strip()
-                    a = re.sub(r'["\']', '', a_blocks[i]).strip()
-                    cards.append({"question": q, "answer": a})
-            
-            return cards if cards else [{"question": "Review this slide", "answer": slide_text}]
+                slide_num = int(entry['slide_num'])
+            except (KeyError, TypeError, ValueError):
+                continue
+            cards_by_slide[slide_num] = entry.get('cards', [])
+
+        return cards_by_slide, not repaired
     
     def create_anki_deck(self, cards, deck_name):
         """Create Anki deck from extracted content with custom name"""
-        deck_id = random.randrange(1 << 30, 1 << 31)
+        # Derive the deck ID from its name so re-importing updates the deck instead of duplicating it
+        deck_id = _stable_anki_id(deck_name)
         deck = genanki.Deck(deck_id, deck_name)
+        self.add_cards_to_deck(deck, cards)
         
+        return deck
+    
+    def add_cards_to_deck(self, deck, cards):
+        """Add the cards as notes to an Anki deck"""
         for card in cards:
             note = genanki.Note(
                 model=self.model,
@@ -308,8 +638,6 @@ class DeepSeekEnhancedConverter:
                 ]
             )
             deck.add_note(note)
-        
-        return deck
     
     def process_file(self, file_path, deck_name, progress_callback=None):
         """Process a presentation file and create AI-enhanced Anki cards"""
@@ -321,19 +649,18 @@ class DeepSeekEnhancedConverter:
             progress_callback(10, "Extracting slides...")
 
         if file_extension == '.pdf':
-            slides_content = self.extract_from_pdf(file_path, progress_callback)
+            total_slides = self.count_pdf_pages(file_path)
+            slides_content = self.iter_slides_from_pdf(file_path, progress_callback)
         else:
             raise ValueError(f"Unsupported file format: {file_extension}")
 
-        # Generate cards using DeepSeek
-        if progress_callback:
-            progress_callback(30, "Generating flashcards with DeepSeek...")
-        cards = self.generate_flashcards_with_deepseek(slides_content, progress_callback)
-        
-        # Create Anki deck
-        if progress_callback:
-            progress_callback(80, "Creating Anki deck...")
-        deck = self.create_anki_deck(cards, deck_name)
+        # Create the Anki deck up front so the notes are added while the remaining slides are generated
+        deck = self.create_anki_deck([], deck_name)
+
+        # Generate cards using DeepSeek while the slides are being extracted
+        cards = self.generate_flashcards_with_deepseek(
+            slides_content, total_slides=total_slides, progress_callback=progress_callback,
+            cards_callback=lambda slide_cards: self.add_cards_to_deck(deck, slide_cards))
         
         # Generate output path in Downloads folder
         base_name = os.path.splitext(os.path.basename(file_path))[0]
@@ -364,7 +691,7 @@ class AnkiConverterApp(tk.Tk):
         
         # Check if API key is available
         if not self.api_key:
-            print("Warning: DEEPSEEK_API_KEY not found in environment variables!")
+            logger.warning("Warning: DEEPSEEK_API_KEY not found in environment variables!")
         
         self.title("Presentation to Anki Flashcards Converter")
         self.geometry("700x800")
@@ -373,6 +700,9 @@ class AnkiConverterApp(tk.Tk):
         self.setup_ui()
     
     def setup_ui(self):
+        # Buttons disabled while a conversion is running
+        self._buttons = []
+        
         # Create a main frame
         main_frame = ttk.Frame(self)
         main_frame.pack(fill=tk.BOTH, expand=True)
@@ -406,6 +736,7 @@ class AnkiConverterApp(tk.Tk):
         # Browse button
         browse_button = ttk.Button(file_frame, text="Browse", command=self.browse_file)
         browse_button.pack(side=tk.RIGHT, padx=5, pady=10)
+        self._buttons.append(browse_button)
         
         # Deck name frame
         deck_frame = ttk.LabelFrame(main_frame, text="Anki Deck Settings")
@@ -419,8 +750,10 @@ class AnkiConverterApp(tk.Tk):
         
         # Debug mode checkbox
         self.debug_var = tk.BooleanVar(value=True)
-        debug_check = ttk.Checkbutton(deck_frame, text="Show detailed processing output", variable=self.debug_var)
+        debug_check = ttk.Checkbutton(deck_frame, text="Show detailed processing output", variable=self.debug_var,
+                                      command=self.update_log_level)
         debug_check.grid(row=1, column=0, columnspan=2, padx=5, pady=5, sticky=tk.W)
+        self.update_log_level()
         
         # Output info label
         ttk.Label(deck_frame, text="Output Location:").grid(row=2, column=0, padx=5, pady=10, sticky=tk.W)
@@ -457,6 +790,7 @@ class AnkiConverterApp(tk.Tk):
         # Convert button
         convert_button = ttk.Button(main_frame, text="Convert to Anki", command=self.convert_to_anki)
         convert_button.pack(pady=10)
+        self._buttons.append(convert_button)
     
     def browse_file(self):
         file_path = filedialog.askopenfilename(
@@ -469,6 +803,10 @@ class AnkiConverterApp(tk.Tk):
             base_name = os.path.splitext(os.path.basename(file_path))[0]
             self.deck_name_var.set(f"{base_name} Flashcards")
     
+    def update_log_level(self):
+        # Only build and print the per-slide details when they are requested
+        logger.setLevel(logging.DEBUG if self.debug_var.get() else logging.WARNING)
+    
     def update_progress(self, value, message):
         self.progress_var.set(value)
         self.status_var.set(message)
@@ -496,10 +834,9 @@ class AnkiConverterApp(tk.Tk):
                                  "Deepseek API key is required. Please set DEEPSEEK_API_KEY in a .env file or enter it above.")
             return
         
-        # Disable the convert button during conversion
-        for widget in self.winfo_children():
-            if isinstance(widget, ttk.Button):
-                widget.configure(state=tk.DISABLED)
+        # Disable the buttons during conversion
+        for button in self._buttons:
+            button.configure(state=tk.DISABLED)
         
         # Reset progress bar
         self.progress_var.set(0)
@@ -529,20 +866,22 @@ class AnkiConverterApp(tk.Tk):
                 self.after(0, lambda: messagebox.showerror("Error", str(e)))
                 self.update_progress(0, "Conversion failed.")
             
-            # Re-enable the convert button
+            # Re-enable the buttons
             self.after(0, self.enable_buttons)
         
         # Start the conversion thread
         threading.Thread(target=run_conversion, daemon=True).start()
     
     def enable_buttons(self):
-        for widget in self.winfo_children():
-            if isinstance(widget, ttk.Button):
-                widget.configure(state=tk.NORMAL)
+        for button in self._buttons:
+            button.configure(state=tk.NORMAL)
 
 
 if __name__ == "__main__":
+    logging.basicConfig(format="%(message)s")
+
     if sys.argv.__len__() > 1 and sys.argv[1].lower() == "nogui":
+        logger.setLevel(logging.DEBUG)
         pdf_file = sys.argv[2]
         deck_name = sys.argv[3]
         api_key = os.environ["DEEPSEEK_API_KEY"]